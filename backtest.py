@@ -0,0 +1,83 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scoring import RF, WEIGHTS, Scores, spy_returns
+
+def rolling_scores(closes, spy):
+    """DAM inputs for every ticker and every month in one pass.
+
+    `closes` is tickers x months and `spy` is months, oldest first. Column t
+    holds the score get_tickers would give with month t as the latest bar:
+    r12 over closes t-12..t, wr12 over the returns of months t-12..t-1, and
+    v6/b6 over months t-12..t-7. Unlike get_tickers, a window with a missing
+    month is NaN rather than skipping the gap.
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=float))
+    n, m = closes.shape
+    r = np.full((n, m), np.nan)
+    r[:, 1:] = closes[:, 1:] / closes[:, :-1] - 1 - RF
+    s = spy_returns(spy)
+    out = [np.full((n, m), np.nan) for _ in Scores._fields]
+    if m < 14:
+        return Scores(*out)
+    r12, wr12, v6, b6, dam = out
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r12[:, 12:] = closes[:, 12:] / closes[:, :-12] - 1
+        wr12[:, 12:] = sliding_window_view(r[:, :-1], 12, axis=1) @ WEIGHTS
+        x = sliding_window_view(r, 6, axis=1)[:, :m - 12]
+        y = sliding_window_view(s, 6)[:m - 12]
+        dx, dy = x - x.mean(axis=2, keepdims=True), y - y.mean(axis=1, keepdims=True)
+        v6[:, 12:] = np.sqrt((dx ** 2).sum(axis=2) / 5) * np.sqrt(2)
+        b6[:, 12:] = (dx * dy).sum(axis=2) / 5 / (dy ** 2).mean(axis=1)
+        dam[:] = (r12 * wr12) / (v6 * b6)
+    dam[(v6 == 0) | (b6 == 0)] = np.nan
+    return Scores(r12, wr12, v6, b6, dam)
+
+def sector_picks(sectors, dam, k=2):
+    """Per sector, the indices of the best `k` tickers for every month (-1 if none)."""
+    picks = {}
+    sectors = np.asarray(sectors)
+    for sec in sorted(set(sectors)):
+        idx = np.flatnonzero(sectors == sec)
+        sub = dam[idx]
+        order = np.argsort(-sub, axis=0, kind="stable")[:k]
+        best = np.where(np.isnan(np.take_along_axis(sub, order, axis=0)), -1, idx[order])
+        if len(best) < k:
+            best = np.vstack([best, np.full((k - len(best), best.shape[1]), -1)])
+        picks[sec] = best
+    return picks
+
+def run(tickers, sectors, closes, spy, months):
+    """Monthly DAM picks per sector and their next-month returns against SPY.
+
+    The picks portfolio holds each sector's top ticker in equal weight.
+    """
+    dam = rolling_scores(closes, spy).dam
+    picks = sector_picks(sectors, dam)
+    fwd = np.full(closes.shape, np.nan)
+    fwd[:, :-1] = closes[:, 1:] / closes[:, :-1] - 1
+    spy_fwd = np.full(len(spy), np.nan)
+    spy_fwd[:-1] = spy[1:] / spy[:-1] - 1
+
+    top = np.vstack([p[0] for p in picks.values()]) if picks else np.full((0, len(months)), -1)
+    held = np.where(top >= 0, fwd[np.maximum(top, 0), np.arange(len(months))], np.nan)
+    with np.errstate(invalid="ignore"):
+        port = np.nansum(held, axis=0) / (~np.isnan(held)).sum(axis=0)
+
+    rows = []
+    for t, month in enumerate(months):
+        table = [{"sector": sec, "ticker": tickers[p[0, t]], "alt_ticker": tickers[p[1, t]] if p[1, t] >= 0 else None}
+                 for sec, p in picks.items() if p[0, t] >= 0]
+        if not table:
+            continue
+        rows.append({"month": month, "picks": table,
+                     "picks_return": None if np.isnan(port[t]) else float(port[t]),
+                     "spy_return": None if np.isnan(spy_fwd[t]) else float(spy_fwd[t])})
+
+    both = [(r["picks_return"], r["spy_return"]) for r in rows if r["picks_return"] is not None and r["spy_return"] is not None]
+    summary = {"months": len(both)}
+    if both:
+        p, s = np.array(both).T
+        summary.update({"picks_total": float(np.prod(1 + p) - 1), "spy_total": float(np.prod(1 + s) - 1),
+                        "hit_rate": float((p > s).mean())})
+    return {"months": rows, "summary": summary}
@@ -0,0 +1,41 @@
+"""500-ticker, 20-year backtest from a warm local store: python -m bench.backtest_bench"""
+import os, sys, tempfile, time
+
+def main(n, start, end):
+    os.environ["DAM_PROVIDER"] = "fake"
+    os.environ["DAM_DB"] = os.path.join(tempfile.mkdtemp(), "backtest.db")
+    os.environ["DAM_UNIVERSE_DIR"] = udir = tempfile.mkdtemp()
+    with open(os.path.join(udir, "bench.csv"), "w") as f:
+        f.write("ticker\n" + "\n".join(f"T{i:04d}" for i in range(n)))
+    import main as app_module
+    import numpy as np
+    from backtest import rolling_scores
+    from scoring import score
+
+    t0 = time.perf_counter()
+    app_module.run_backtest("bench", start, end)
+    cold = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    result = app_module.run_backtest("bench", start, end)
+    warm = time.perf_counter() - t0
+
+    tickers = [f"T{i:04d}" for i in range(n)]
+    closes = app_module.store.get_panel(["SPY"] + tickers, *app_module.backtest_dates(start, end)).closes
+    c, spy = closes[tickers].to_numpy().T, closes["SPY"].to_numpy()
+    t0 = time.perf_counter()
+    rolling = rolling_scores(c, spy)
+    secs = time.perf_counter() - t0
+
+    # every month matches scoring.score on that month's 14-bar window
+    for t in range(13, c.shape[1], 17):
+        want = score(c[:, t - 13:t + 1], spy[t - 13:t + 1]).dam
+        assert np.allclose(rolling.dam[:, t], want, rtol=1e-9, equal_nan=True), f"month {t} differs"
+
+    print(f"{n} tickers, {start}..{end}: {len(result['months'])} months ranked")
+    print(f"  cold (fill store)   {cold:7.2f} s")
+    print(f"  warm (local store)  {warm:7.2f} s")
+    print(f"  rolling scores only {secs * 1000:7.1f} ms, parity with scoring.score ok")
+    print(f"  summary {result['summary']}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500, "2005-01", "2024-12")
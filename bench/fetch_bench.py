@@ -0,0 +1,113 @@
+"""Offline fetch and price store checks and benchmark: python -m bench.fetch_bench"""
+import os, tempfile, time
+from datetime import datetime
+from market import FakeProvider, fetch_panel
+
+def run(n, latency, chunk, workers):
+    tickers = ["SPY"] + [f"T{i:04d}" for i in range(n)]
+    p = FakeProvider(latency=latency, fail=["T0003"], missing=["T0005"])
+    t0 = time.perf_counter()
+    panel = fetch_panel(p, tickers, "2024-09-01", "2025-10-17", chunk=chunk, workers=workers, retries=1, backoff=0)
+    return time.perf_counter() - t0, p.calls, panel
+
+def check():
+    tickers = [f"T{i:04d}" for i in range(16)]
+    opts = dict(start="2024-01-01", end="2025-01-01", chunk=16, retries=1, backoff=0)
+
+    p = FakeProvider()
+    panel = fetch_panel(p, tickers, **opts)
+    assert list(panel.closes.columns) == tickers and not panel.failed and p.calls == 1
+
+    # a failing symbol is isolated by bisection; its chunk-mates come back
+    p = FakeProvider(fail=["T0003"])
+    panel = fetch_panel(p, tickers, **opts)
+    assert list(panel.closes.columns) == [t for t in tickers if t != "T0003"]
+    assert list(panel.failed) == ["T0003"] and "TimeoutError" in panel.failed["T0003"]
+    assert p.calls <= 2 + 2 * 4, p.calls
+
+    # symbols without data are retried, then reported rather than raised
+    p = FakeProvider(missing=["T0005", "T0009"])
+    panel = fetch_panel(p, tickers, **opts)
+    assert panel.failed == {"T0005": "no data", "T0009": "no data"} and p.calls == 2
+    assert "T0005" not in panel.closes.columns and len(panel.closes.columns) == 14
+
+    # bad symbols in both halves are still isolated, not taken for an outage
+    p = FakeProvider(fail=["T0003", "T0012"])
+    panel = fetch_panel(p, tickers, **opts)
+    assert sorted(panel.failed) == ["T0003", "T0012"], panel.failed
+    assert list(panel.closes.columns) == [t for t in tickers if t not in panel.failed]
+    assert p.calls <= 2 + 2 + 2 * 2 * 4, p.calls
+
+    # an outage fails the whole chunk without splitting down to single symbols
+    p = FakeProvider(fail=tickers)
+    panel = fetch_panel(p, tickers, **opts)
+    assert panel.closes.empty and sorted(panel.failed) == tickers and p.calls == 2 + 2 + 2, p.calls
+
+    # chunks fail independently
+    p = FakeProvider(fail=tickers[:8])
+    panel = fetch_panel(p, tickers, **{**opts, "chunk": 8})
+    assert list(panel.closes.columns) == tickers[8:] and sorted(panel.failed) == tickers[:8]
+    print("fetch checks ok")
+
+class Recorder(FakeProvider):
+    # records each download's start and tickers, scales every close by `scale` and has
+    # no bars for `delisted` tickers after their month
+    def __init__(self, delisted=(), **kw):
+        super().__init__(**kw)
+        self.delisted = dict(delisted)
+        self.scale = 1.0
+        self.requests = []
+
+    def download(self, tickers, start, end, timeout):
+        self.requests.append((start, sorted(tickers)))
+        df = super().download(tickers, start, end, timeout) * self.scale
+        for t, month in self.delisted.items():
+            if t in df.columns:
+                df.loc[df.index > month + "-01", t] = float("nan")
+        return df
+
+def check_store():
+    from store import PriceStore
+    tickers = [f"T{i:04d}" for i in range(8)]
+    today = datetime.now()
+    start, end = f"{today.year - 2}-01-01", today.strftime("%Y-%m-%d")
+    p = Recorder(missing=["T0006"], fail=["T0007"], delisted={"T0005": f"{today.year - 1}-06"})
+    store = PriceStore(os.path.join(tempfile.mkdtemp(), "check.db"), p, open_ttl=0)
+    fetch = lambda: store.get_panel(tickers, start, end)
+
+    panel = fetch()
+    assert list(panel.closes.columns) == tickers[:6] and panel.failed["T0006"] == "no data"
+    assert "TimeoutError" in panel.failed["T0007"]
+
+    # warm: only the open month is refetched, one final month back; the
+    # missing and delisted tickers are not asked for again, the failing one is
+    p.requests = []
+    panel = fetch()
+    prev = f"{today.year - (today.month == 1)}-{(today.month - 2) % 12 + 1:02d}-01"
+    assert sorted(panel.failed) == ["T0006", "T0007"] and panel.closes["T0005"].notna().any()
+    assert p.requests == [(prev, tickers[:5])] + [(start, ["T0007"])] * 3, p.requests
+
+    # a re-adjusted overlap bar drops the stored history and refetches it all
+    p.scale, p.requests = 2.0, []
+    again = fetch()
+    assert p.requests[0] == (prev, tickers[:5]) and (start, tickers[:5]) in p.requests, p.requests
+    assert abs(again.closes["T0000"].iloc[0] / panel.closes["T0000"].iloc[0] - 2) < 1e-9
+
+    # invalidate forgets bars, coverage and the no-data entry
+    store.invalidate("T0000", "T0006")
+    p.requests = []
+    fetch()
+    assert {"T0000", "T0006"} <= set(p.requests[0][1]) and p.requests[0][0] == start, p.requests
+    assert (prev, tickers[1:5]) in p.requests, p.requests
+    print("store checks ok")
+
+if __name__ == "__main__":
+    check()
+    check_store()
+    print(f"{'tickers':>8} {'mode':>12} {'calls':>6} {'secs':>7} {'failed':>7}")
+    for n in (27, 500):
+        for mode, chunk, workers in (("sequential", 1, 1), ("chunked", 50, 4)):
+            if mode == "sequential" and n > 100:
+                continue
+            secs, calls, panel = run(n, 0.05, chunk, workers)
+            print(f"{n:>8} {mode:>12} {calls:>6} {secs:>7.2f} {len(panel.failed):>7}")
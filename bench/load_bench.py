@@ -0,0 +1,39 @@
+"""50 concurrent clients against the in-process app: python -m bench.load_bench
+
+A cold start where every client posts /tickers for the same month at once,
+while other clients keep loading the login page. Provider calls sleep to
+stand in for Yahoo round-trips.
+"""
+import asyncio, os, sys, tempfile, time
+import numpy as np
+
+CLIENTS = 50
+
+async def timed(app, method, path, out):
+    from bench.asgi import call
+    t0 = time.perf_counter()
+    status, _ = await call(app, method, path)
+    assert status == 200, (path, status)
+    out.append(time.perf_counter() - t0)
+
+def pct(xs):
+    return f"p50 {np.percentile(xs, 50) * 1000:7.1f} ms   p99 {np.percentile(xs, 99) * 1000:7.1f} ms"
+
+async def main(latency):
+    import main as app_module
+    app_module.provider.latency = latency
+    tickers, login = [], []
+    t0 = time.perf_counter()
+    jobs = [timed(app_module.app, "POST", "/tickers", tickers) for _ in range(CLIENTS)]
+    jobs += [timed(app_module.app, "GET", "/", login) for _ in range(CLIENTS)]
+    await asyncio.gather(*jobs)
+    wall = time.perf_counter() - t0
+    print(f"provider latency {latency * 1000:.0f} ms, {CLIENTS} + {CLIENTS} clients, wall {wall:.2f} s")
+    print(f"  POST /tickers  {pct(tickers)}")
+    print(f"  GET  /         {pct(login)}")
+    print(f"  provider download calls: {app_module.provider.calls}")
+
+if __name__ == "__main__":
+    os.environ["DAM_PROVIDER"] = "fake"
+    os.environ["DAM_DB"] = os.path.join(tempfile.mkdtemp(), "load.db")
+    asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.2))
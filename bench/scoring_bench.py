@@ -0,0 +1,65 @@
+"""Scoring throughput and parity with the original per-ticker loop: python -m bench.scoring_bench"""
+import time
+import numpy as np, pandas as pd
+from scoring import score
+
+WEIGHTS = [0.01, 0.01, 0.04, 0.04, 0.09, 0.09, 0.16, 0.16, 0.25, 0.25, 0.36, 0.36]
+
+def reference(closes, spy, dates, names):
+    # the groupby loop get_tickers used before scoring.py
+    spy = pd.DataFrame({"Date": dates, "Close": spy}).dropna()
+    spy["SPY1R"] = spy["Close"].pct_change().sub(0.024 / 12).fillna(0)
+    spy_map = dict(zip(spy["Date"], spy["SPY1R"]))
+    dfs = []
+    for t, row in zip(names, closes):
+        df = pd.DataFrame({"Date": dates, "Close": row}).dropna()
+        df["Ticker"] = t
+        df["1R"] = df["Close"].pct_change().sub(0.024 / 12)
+        df["SPY1R"] = df["Date"].map(spy_map)
+        df = df.dropna(subset=["1R", "SPY1R"])
+        if len(df) >= 13:
+            dfs.append(df)
+    out = {}
+    for t, grp in pd.concat(dfs).groupby("Ticker"):
+        grp = grp.sort_values("Date").reset_index(drop=True)
+        r12 = (grp.loc[12, "Close"] - grp.loc[0, "Close"]) / grp.loc[0, "Close"]
+        wr12 = sum(grp.loc[i, "1R"] * WEIGHTS[i] for i in range(12))
+        v6 = grp.loc[:5, "1R"].std(ddof=1) * np.sqrt(2)
+        cov = np.cov(grp.loc[:5, "1R"], grp.loc[:5, "SPY1R"])[0, 1]
+        b6 = cov / np.var(grp.loc[:5, "SPY1R"])
+        if v6 == 0 or b6 == 0:
+            continue
+        out[t] = (r12 * wr12) / (v6 * b6)
+    return out
+
+def panel(n, months=14, gaps=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 50 * np.exp(np.cumsum(rng.normal(0.008, 0.07, (n, months)), axis=1))
+    closes[rng.random((n, months)) < gaps] = np.nan
+    spy = 400 * np.exp(np.cumsum(rng.normal(0.007, 0.04, months)))
+    return closes, spy
+
+if __name__ == "__main__":
+    dates = pd.date_range("2024-09-01", periods=16, freq="MS")
+    closes, spy = panel(200, months=16, gaps=0.05)
+    spy[3] = np.nan
+    names = [f"T{i}" for i in range(len(closes))]
+    ref, dam = reference(closes, spy, dates, names), score(closes, spy).dam
+    got = {t: d for t, d in zip(names, dam) if not np.isnan(d)}
+    assert got.keys() == ref.keys(), "eligible tickers differ"
+    assert np.allclose([got[t] for t in ref], list(ref.values()), rtol=1e-9)
+    print(f"parity ok on {len(ref)} tickers with gaps")
+
+    print(f"{'tickers':>8} {'loop ms':>9} {'vector ms':>10} {'tickers/s':>12}")
+    for n in (30, 500, 5000):
+        closes, spy = panel(n)
+        names = [f"T{i}" for i in range(n)]
+        t0 = time.perf_counter()
+        if n <= 500:
+            reference(closes, spy, dates[:14], names)
+        loop = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        for _ in range(10):
+            score(closes, spy)
+        vec = (time.perf_counter() - t0) * 100
+        print(f"{n:>8} {loop if n <= 500 else float('nan'):>9.1f} {vec:>10.2f} {n / vec * 1000:>12,.0f}")
@@ -0,0 +1,123 @@
+"""Offline benchmark of the /instructions and /tickers request paths.
+
+    python -m bench.suite [--sizes 30,500,3000] [--fixture DIR] [--out FILE] [--compare FILE]
+    python -m bench.suite --record DIR [--universe default]    # needs network
+
+Each universe size runs in a fresh process with its own database, driving
+the FastAPI app in-process with synthetic prices (FakeProvider) or a
+recorded fixture (ReplayProvider). Reports wall time per stage (with the
+dam_stage_seconds spans inside it), requests per second and the process
+memory high-water mark after each stage.
+"""
+import argparse, asyncio, json, os, platform, resource, subprocess, sys, tempfile, time
+
+STAGES = ["tickers_cold", "tickers_rebuild", "tickers_stream", "tickers_snapshot", "instructions"]
+
+def rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+async def run_one(n, repeat):
+    import main
+    from bench.asgi import call
+    from metrics import registry
+    app, out = main.app, {}
+
+    async def stage(name, method, path, body=b"", times=1, reset=False):
+        if reset:
+            main.snapshots.current.clear()
+        before = registry.stage_totals()
+        t0 = time.perf_counter()
+        for _ in range(times):
+            status, _ = await call(app, method, path, body)
+            assert status == 200, (name, status)
+        wall = time.perf_counter() - t0
+        spans = {k: (v - before.get(k, 0)) / times for k, v in registry.stage_totals().items()}
+        out[name] = {"seconds": wall / times, "rps": times / wall, "rss_mb": rss_mb(),
+                     "spans": {k: v for k, v in spans.items() if v > 0}}
+
+    await stage("tickers_cold", "POST", "/tickers", b"universe=bench")
+    await stage("tickers_rebuild", "POST", "/tickers", b"universe=bench", reset=True)
+    await stage("tickers_stream", "GET", "/tickers/stream?universe=bench", reset=True)
+    await stage("tickers_snapshot", "POST", "/tickers", b"universe=bench", times=repeat)
+    await stage("instructions", "GET", "/instructions", times=repeat)
+    return {"tickers": n, "provider_calls": main.provider.calls, "store": main.store.stats(), "stages": out}
+
+def one(n, fixture, repeat):
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DAM_DB=os.path.join(tmp, "bench.db"), DAM_UNIVERSE_DIR=tmp, DAM_UNIVERSE="bench",
+                      DAM_PROVIDER=f"replay:{fixture}" if fixture else "fake")
+    if fixture:
+        from market import ReplayProvider
+        tickers = [t for t in ReplayProvider(fixture).closes.columns if t != "SPY"][:n]
+    else:
+        tickers = [f"T{i:04d}" for i in range(n)]
+    with open(os.path.join(tmp, "bench.csv"), "w") as f:
+        f.write("ticker\n" + "\n".join(tickers) + "\n")
+    return asyncio.run(run_one(len(tickers), repeat))
+
+def git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def report(results, base=None):
+    base = {r["tickers"]: r["stages"] for r in (base or {}).get("results", [])}
+    print(f"{'tickers':>8} {'stage':<18} {'ms':>10} {'req/s':>10} {'rss MB':>8}" + ("  vs base" if base else ""))
+    for r in results:
+        for name in STAGES:
+            st = r["stages"][name]
+            line = f"{r['tickers']:>8} {name:<18} {st['seconds'] * 1000:>10.2f} {st['rps']:>10.1f} {st['rss_mb']:>8.1f}"
+            old = base.get(r["tickers"], {}).get(name)
+            if old:
+                line += f"  {(st['seconds'] / old['seconds'] - 1) * 100:+7.1f}%"
+            print(line)
+            for span, sec in sorted(st.get("spans", {}).items(), key=lambda kv: -kv[1]):
+                print(f"{'':>8}   {span:<16} {sec * 1000:>10.2f}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="30,500,3000")
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--fixture")
+    ap.add_argument("--out")
+    ap.add_argument("--compare")
+    ap.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--record")
+    ap.add_argument("--universe", default="default")
+    args = ap.parse_args()
+
+    if args.one:
+        print(json.dumps(one(args.one, args.fixture, args.repeat)))
+        return
+    if args.record:
+        from market import YahooProvider, record
+        from universe import load_universe
+        end = time.strftime("%Y-%m-%d")
+        start = f"{int(end[:4]) - 2}{end[4:7]}-01"
+        panel = record(YahooProvider(), load_universe(args.universe), start, end, args.record)
+        print(f"recorded {panel.closes.shape[1]} tickers x {len(panel.closes)} months to {args.record}")
+        return
+
+    results = []
+    for n in map(int, args.sizes.split(",")):
+        cmd = [sys.executable, "-m", "bench.suite", "--one", str(n), "--repeat", str(args.repeat)]
+        if args.fixture:
+            cmd += ["--fixture", os.path.abspath(args.fixture)]
+        proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    doc = {"commit": git_rev(), "python": platform.python_version(), "platform": platform.platform(),
+           "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+    base = None
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+    report(results, base)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=1)
+
+if __name__ == "__main__":
+    main()
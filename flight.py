@@ -0,0 +1,20 @@
+import asyncio
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight task."""
+
+    def __init__(self):
+        self._calls = {}
+
+    def start(self, key, fn, *args):
+        """The task running `fn(*args)` for `key`, started unless one is in flight."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return task
+
+    async def do(self, key, fn, *args):
+        # shielded so one client disconnecting doesn't cancel it for the rest
+        return await asyncio.shield(self.start(key, fn, *args))
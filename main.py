@@ -1,25 +1,47 @@
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Form, Request, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-import pandas as pd, numpy as np
-import yfinance as yf
-from yahooquery import Ticker
+from functools import partial
+import asyncio, json, logging, os, re
+import anyio
+from market import make_provider
+from store import PriceStore
+from pipeline import rank
+import backtest
+from universe import list_universes, load_universe
+from snapshot import Snapshots
+from flight import SingleFlight
+from metadata import MetadataIndex
+from metrics import TimingMiddleware, inc, registry, span
 
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(TimingMiddleware, slow_ms=float(os.environ.get("DAM_SLOW_MS", "0")))
 
 AUTHORIZED_CODE = "freelunch"
-
-def flatten(df):
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.droplevel(1)
-    return df
+DEFAULT_UNIVERSE = os.environ.get("DAM_UNIVERSE", "default")
+CHUNK = int(os.environ.get("DAM_CHUNK", "250"))
+provider = make_provider(os.environ.get("DAM_PROVIDER", "yahoo"))
+store = PriceStore(os.environ.get("DAM_DB", "dam.db"), provider, open_ttl=int(os.environ.get("DAM_OPEN_TTL", "900")),
+                   no_data_ttl=int(os.environ.get("DAM_NO_DATA_TTL", "86400")))
+metadata = MetadataIndex(provider, ttl_days=int(os.environ.get("DAM_META_TTL_DAYS", "90")))
+io_limiter = anyio.CapacityLimiter(int(os.environ.get("DAM_IO_THREADS", "8")))
+flights = SingleFlight()
+logger = logging.getLogger("dam")
+
+async def offload(fn, *args):
+    # provider and database calls block, so keep them off the event loop
+    return await anyio.to_thread.run_sync(partial(fn, *args), limiter=io_limiter)
+
+def log_failure(task):
+    if not task.cancelled() and task.exception():
+        logger.error("background snapshot build failed", exc_info=task.exception())
 
 @app.api_route("/", methods=["GET", "POST"], response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -30,119 +52,171 @@ async def login_page(request: Request):
         return templates.TemplateResponse("login.html", {"request": request, "error": "Invalid access code"})
     return templates.TemplateResponse("login.html", {"request": request, "error": None})
 
-@app.get("/instructions", response_class=HTMLResponse)
-async def show_instructions(request: Request):
+async def latest_month():
+    # month of the newest SPY bar, the data month snapshots are built for
     today = datetime.now()
-    cm = today.strftime("%Y-%m")
     sd = (today - relativedelta(months=13)).replace(day=1).strftime("%Y-%m-%d")
     ed = today.strftime("%Y-%m-%d")
-    spy = flatten(yf.download("SPY", start=sd, end=ed, interval="1mo", auto_adjust=True))
+    with span("spy_download"):
+        spy = (await flights.do(("spy", sd, ed), offload, store.get_panel, ["SPY"], sd, ed)).closes
+    return spy["SPY"].dropna().index.max().strftime("%Y-%m") if "SPY" in spy.columns else None
+
+def refresh_snapshot(universe, latest):
+    if snapshots.stale(universe, latest):
+        # keeps serving the old snapshot; /tickers joins this build if it has none
+        task = flights.start(("snapshot", universe), offload, snapshots.refresh, universe, latest)
+        task.add_done_callback(log_failure)
 
-    if spy.empty or "Close" not in spy.columns:
+@app.get("/instructions", response_class=HTMLResponse)
+async def show_instructions(request: Request):
+    cm = datetime.now().strftime("%Y-%m")
+    latest = await latest_month()
+    if latest is None:
         latest = "N/A"
     else:
-        spy = spy.reset_index()
-        latest = spy["Date"].max().strftime("%Y-%m")
+        for universe in {DEFAULT_UNIVERSE, *snapshots.current}:
+            refresh_snapshot(universe, latest)
 
     return templates.TemplateResponse("instructions.html", {
         "request": request,
         "current_month": cm,
         "latest_date": latest,
-        "is_current": latest == cm
+        "is_current": latest == cm,
+        "universes": list_universes(),
+        "universe": DEFAULT_UNIVERSE
     })
 
-@app.post("/tickers", response_class=HTMLResponse)
-async def get_tickers(request: Request):
-    tickers = [
-        "AAPL", "MSFT", "GOOGL", "META", "TSLA", "AMZN", "WMT", "PEP", "COP", "CVX",
-        "JPM", "MS", "JNJ", "ABBV", "UNH", "GE", "CAT", "NVDA", "SO", "DUK",
-        "PLD", "O", "LIN", "SHW", "T", "F", "MRK"
-    ]
+def rank_events(universe):
+    """Progress dicts while ranking `universe`; the last one is the snapshot payload."""
+    tickers = load_universe(universe)
     today = datetime.now()
     sd = (today - relativedelta(months=13)).replace(day=1).strftime("%Y-%m-%d")
     ed = today.strftime("%Y-%m-%d")
 
-    spy = flatten(yf.download("SPY", start=sd, end=ed, interval="1mo", auto_adjust=True))
-    if spy.empty or "Close" not in spy.columns:
-        return templates.TemplateResponse("tickers.html", {
-            "request": request,
-            "tickers": [],
-            "weights": [],
-            "error": "SPY data missing or incomplete"
-        })
-
-    spy = spy.reset_index()
-    spy["SPY1R"] = spy["Close"].pct_change().sub(0.024 / 12).fillna(0)
-    spy_map = dict(zip(spy["Date"], spy["SPY1R"]))
-
-    dfs = []
-    for t in tickers:
-        df = flatten(yf.download(t, start=sd, end=ed, interval="1mo", auto_adjust=True))
-        if df.empty or "Close" not in df.columns:
-            continue
-        df = df.reset_index()
-        df["Ticker"] = t
-        df["Sector"] = yf.Ticker(t).info.get("sector", "N/A")
-        df["1R"] = df["Close"].pct_change().sub(0.024 / 12)
-        df["SPY1R"] = df["Date"].map(spy_map)
-        df = df.dropna(subset=["1R", "SPY1R"])
-        if len(df) >= 13 and df["Sector"].iloc[0] != "N/A":
-            dfs.append(df)
-
-    if not dfs:
-        return templates.TemplateResponse("tickers.html", {
-            "request": request,
-            "tickers": [],
-            "weights": [],
-            "error": "No tickers met the minimum criteria"
-        })
-
-    df_all = pd.concat(dfs)
-    weights = [0.01, 0.01, 0.04, 0.04, 0.09, 0.09, 0.16, 0.16, 0.25, 0.25, 0.36, 0.36]
-    results = []
-
-    for t, grp in df_all.groupby("Ticker"):
-        grp = grp.sort_values("Date").reset_index(drop=True)
-        try:
-            r12 = (grp.loc[12, "Close"] - grp.loc[0, "Close"]) / grp.loc[0, "Close"]
-            wr12 = sum(grp.loc[i, "1R"] * weights[i] for i in range(12))
-            v6 = grp.loc[:5, "1R"].std(ddof=1) * np.sqrt(2)
-            cov = np.cov(grp.loc[:5, "1R"], grp.loc[:5, "SPY1R"])[0, 1]
-            b6 = cov / np.var(grp.loc[:5, "SPY1R"])
-            if v6 == 0 or b6 == 0:
-                continue
-            dam = (r12 * wr12) / (v6 * b6)
-            results.append({"Sector": grp["Sector"].iloc[0], "Ticker": t, "D": dam})
-        except Exception:
-            continue
-
-    df_result = pd.DataFrame(results).dropna(subset=["D"])
-    df_result = df_result.sort_values("D", ascending=False)
-
-    final_rows = []
-    for sector, group in df_result.groupby("Sector"):
-        top = group.head(2)
-        row = {"sector": sector, "ticker": None, "alt_ticker": None}
-        if len(top) > 0:
-            row["ticker"] = top.iloc[0]["Ticker"]
-        if len(top) > 1:
-            row["alt_ticker"] = top.iloc[1]["Ticker"]
-        final_rows.append(row)
+    for event in rank(store, metadata, tickers, sd, ed, chunk=CHUNK):
+        if "tickers" not in event and "error" not in event:
+            yield event
+    if event.get("error"):
+        yield {**event, "universe": universe, "month": None, "tickers": [], "weights": []}
+        return
+    if not event["eligible"]:
+        yield {**event, "universe": universe, "tickers": [], "weights": [], "error": "No tickers met the minimum criteria"}
+        return
 
     try:
-        spy_info = Ticker("SPY")
-        sector_data = spy_info.fund_sector_weightings
-        if isinstance(sector_data, dict) and "SPY" in sector_data:
-            weight_map = sector_data["SPY"]
-        else:
-            weight_map = {}
+        with span("sector_weights"):
+            inc("dam_provider_calls_total", method="sector_weights")
+            weight_map = provider.sector_weights("SPY")
     except Exception:
+        inc("dam_provider_errors_total", method="sector_weights")
         weight_map = {}
 
     weight_table = [{"sector": sec, "weight": f"{wt:.2%}"} for sec, wt in weight_map.items()]
-    return templates.TemplateResponse("tickers.html", {
-        "request": request,
-        "tickers": final_rows,
-        "weights": weight_table,
-        "error": None
-    })
+    yield {**event, "universe": universe, "weights": weight_table, "error": None}
+
+# progress events of the build in flight per universe, for stream clients
+progress = {}
+
+def build_snapshot(universe):
+    events = progress[universe] = []
+    try:
+        # timed here rather than by each caller, so coalesced waiters count one build
+        with span("snapshot_build"):
+            for event in rank_events(universe):
+                if "tickers" not in event:
+                    events.append(event)
+    finally:
+        progress.pop(universe, None)
+    return event
+
+snapshots = Snapshots(build_snapshot)
+
+@app.post("/tickers", response_class=HTMLResponse)
+async def get_tickers(request: Request):
+    universe = (await request.form()).get("universe") or DEFAULT_UNIVERSE
+    snap = snapshots.current.get(universe)
+    if snap is None and universe not in list_universes():
+        snap = {"tickers": [], "weights": [], "error": f"Unknown universe: {universe}"}
+    elif snap is None:
+        inc("dam_cache_total", cache="snapshot", result="miss")
+        snap = await flights.do(("snapshot", universe), offload, snapshots.get, universe)
+    else:
+        inc("dam_cache_total", cache="snapshot", result="hit")
+        if snap["month"] < datetime.now().strftime("%Y-%m"):
+            # workers that never serve /instructions notice a new month here
+            latest = await latest_month()
+            if latest is not None:
+                refresh_snapshot(universe, latest)
+    with span("render"):
+        return templates.TemplateResponse("tickers.html", {
+            "request": request,
+            "tickers": snap["tickers"],
+            "weights": snap["weights"],
+            "error": snap["error"]
+        })
+
+@app.get("/tickers/stream")
+async def stream_tickers(universe: str = DEFAULT_UNIVERSE):
+    """Newline-delimited JSON: progress per chunk, then the snapshot payload."""
+    if universe not in list_universes():
+        raise HTTPException(404, f"Unknown universe: {universe}")
+
+    async def events():
+        snap = snapshots.current.get(universe)
+        inc("dam_cache_total", cache="snapshot", result="miss" if snap is None else "hit")
+        if snap is None:
+            # join (or start) the same build POST /tickers uses and relay its progress
+            task = flights.start(("snapshot", universe), offload, snapshots.get, universe)
+            seen, events = 0, None
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=0.1)
+                events = events if events is not None else progress.get(universe)
+                for event in (events or [])[seen:]:
+                    seen += 1
+                    yield json.dumps(event) + "\n"
+                if done:
+                    break
+            snap = task.result()
+        yield json.dumps(snap) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+def backtest_dates(start, end):
+    # 13 bars of history before `start`, and the bar after `end` for its
+    # forward return; Yahoo's end is exclusive, so ask for a day past it
+    sd = (datetime.strptime(start, "%Y-%m") - relativedelta(months=13)).strftime("%Y-%m-%d")
+    ed = min(datetime.strptime(end, "%Y-%m") + relativedelta(months=1, days=1), datetime.now()).strftime("%Y-%m-%d")
+    return sd, ed
+
+def run_backtest(universe, start, end):
+    tickers = load_universe(universe)
+    closes = store.get_panel(["SPY"] + tickers, *backtest_dates(start, end)).closes
+    if "SPY" not in closes.columns:
+        raise HTTPException(503, "SPY data missing or incomplete")
+    closes = closes[closes["SPY"].notna()]
+    sectors = metadata.sectors([t for t in tickers if t in closes.columns])
+    names = [t for t in tickers if t in closes.columns and sectors.get(t, "N/A") != "N/A"]
+    months = [d.strftime("%Y-%m") for d in closes.index]
+    result = backtest.run(names, [sectors[t] for t in names], closes[names].to_numpy().T,
+                          closes["SPY"].to_numpy(), months)
+    result["months"] = [r for r in result["months"] if start <= r["month"] <= end]
+    return {"universe": universe, "start": start, "end": end, **result}
+
+@app.get("/backtest")
+async def get_backtest(universe: str = DEFAULT_UNIVERSE, start: str = "2005-01", end: str = None):
+    """DAM picks per sector for every month from start to end (YYYY-MM) with next-month returns vs SPY."""
+    cm = datetime.now().strftime("%Y-%m")
+    end = end or cm
+    if not all(re.fullmatch(r"(19|[2-9]\d)\d\d-(0[1-9]|1[0-2])", m) for m in (start, end)):
+        raise HTTPException(400, "start and end must be YYYY-MM from 1900-01")
+    # months after the current one have no data yet
+    end = min(end, cm)
+    if start > end:
+        raise HTTPException(400, "start must not be after end or the current month")
+    if universe not in list_universes():
+        raise HTTPException(404, f"Unknown universe: {universe}")
+    return await flights.do(("backtest", universe, start, end), offload, run_backtest, universe, start, end)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,209 @@
+import json, os, threading, time, zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd, numpy as np
+from metrics import inc
+
+Panel = namedtuple("Panel", ["closes", "failed"])
+
+class YahooProvider:
+    # yf.download keeps per-call state in module globals, so calls are
+    # serialised here and yfinance's own threads do the fan-out per chunk.
+    _lock = threading.Lock()
+
+    def download(self, tickers, start, end, timeout):
+        import yfinance as yf
+        with self._lock:
+            df = yf.download(tickers, start=start, end=end, interval="1mo", auto_adjust=True,
+                             group_by="column", threads=min(len(tickers), 8), progress=False, timeout=timeout)
+        if df is None or df.empty or "Close" not in df.columns.get_level_values(0):
+            return pd.DataFrame()
+        return df["Close"]
+
+    def profiles(self, tickers):
+        from yahooquery import Ticker
+        modules = Ticker(tickers, asynchronous=True).get_modules("assetProfile price")
+        out = {}
+        for t, m in modules.items():
+            if not isinstance(m, dict):
+                # an error string (unknown symbol, 401, rate limit): leave it out so it retries
+                continue
+            profile, price = m.get("assetProfile") or {}, m.get("price") or {}
+            out[t] = {"sector": profile.get("sector", "N/A"), "name": price.get("longName") or price.get("shortName")}
+        return out
+
+    def sector_weights(self, symbol):
+        from yahooquery import Ticker
+        sector_data = Ticker(symbol).fund_sector_weightings
+        if isinstance(sector_data, dict) and symbol in sector_data:
+            return sector_data[symbol]
+        return {}
+
+class FakeProvider:
+    """Deterministic offline stand-in for YahooProvider."""
+
+    SECTORS = ["Technology", "Communication Services", "Consumer Cyclical", "Consumer Defensive", "Energy",
+               "Financial Services", "Healthcare", "Industrials", "Utilities", "Real Estate", "Basic Materials"]
+
+    def __init__(self, latency=0.0, fail=(), missing=()):
+        self.latency = latency
+        self.fail = set(fail)
+        self.missing = set(missing)
+        self.calls = 0
+
+    def _seed(self, t):
+        return zlib.crc32(t.encode())
+
+    def download(self, tickers, start, end, timeout):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail & set(tickers):
+            raise TimeoutError("fake provider timeout")
+        # `end` is exclusive, as with yf.download
+        idx = pd.date_range(start, end, freq="MS", inclusive="left", name="Date")
+        # months since 1990-01, so every call sees the same path per ticker
+        pos = (idx.year - 1990) * 12 + idx.month - 1
+        names = [t for t in tickers if t not in self.missing]
+        data = np.full((len(idx), len(names)), np.nan)
+        keep = pos >= 0
+        for j, t in enumerate(names):
+            if keep.any():
+                steps = np.random.default_rng(self._seed(t)).normal(0.008, 0.07, pos[-1] + 1)
+                data[keep, j] = 50 * np.exp(np.cumsum(steps))[pos[keep]]
+        return pd.DataFrame(data, index=idx, columns=names)
+
+    def profiles(self, tickers):
+        return {t: {"sector": self.SECTORS[self._seed(t) % len(self.SECTORS)], "name": f"{t} Inc."}
+                for t in tickers if t not in self.missing}
+
+    def sector_weights(self, symbol):
+        return {s.lower().replace(" ", "_"): 1 / len(self.SECTORS) for s in self.SECTORS}
+
+class ReplayProvider:
+    """Serves a recorded panel from a directory written by `record`.
+
+    The recorded months are shifted so the last one is the current month,
+    letting old recordings drive the live request paths.
+    """
+
+    def __init__(self, path):
+        closes = pd.read_csv(os.path.join(path, "closes.csv"), index_col="Date", parse_dates=True)
+        today, last = pd.Timestamp.now(), closes.index.max()
+        closes.index = closes.index + pd.DateOffset(months=(today.year - last.year) * 12 + today.month - last.month)
+        self.closes = closes
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self._profiles, self.weights = meta["profiles"], meta["weights"]
+        self.calls = 0
+
+    def download(self, tickers, start, end, timeout):
+        self.calls += 1
+        rows = (self.closes.index >= start) & (self.closes.index < end)
+        return self.closes.loc[rows, [t for t in tickers if t in self.closes.columns]]
+
+    def profiles(self, tickers):
+        return {t: self._profiles[t] for t in tickers if t in self._profiles}
+
+    def sector_weights(self, symbol):
+        return self.weights
+
+def record(provider, tickers, start, end, path):
+    """Save closes, profiles and SPY sector weights for ReplayProvider."""
+    os.makedirs(path, exist_ok=True)
+    panel = fetch_panel(provider, ["SPY"] + list(tickers), start, end)
+    panel.closes.to_csv(os.path.join(path, "closes.csv"))
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"profiles": provider.profiles(list(panel.closes.columns)),
+                   "weights": provider.sector_weights("SPY")}, f, indent=1)
+    return panel
+
+def make_provider(name):
+    # "yahoo", "fake", or "replay:<dir>"
+    if name == "fake":
+        return FakeProvider()
+    if name.startswith("replay:"):
+        return ReplayProvider(name[len("replay:"):])
+    return YahooProvider()
+
+def _download(provider, todo, start, end, timeout):
+    inc("dam_provider_calls_total", method="download")
+    try:
+        df = provider.download(todo, start, end, timeout)
+    except Exception:
+        inc("dam_provider_errors_total", method="download")
+        raise
+    got = {t: df[t] for t in todo if t in df.columns and df[t].notna().any()}
+    return got, {t: "no data" for t in todo if t not in got}
+
+def _split(provider, todo, start, end, timeout):
+    # bisect a failing chunk to isolate bad symbols
+    half = len(todo) // 2
+    got, reason, errored = {}, {}, []
+    for part in (todo[:half], todo[half:]):
+        try:
+            g, r = _download(provider, part, start, end, timeout)
+        except Exception as e:
+            reason.update({t: f"{type(e).__name__}: {e}" for t in part})
+            errored.append(part)
+            continue
+        got.update(g)
+        reason.update(r)
+    if len(errored) == 2:
+        # both halves failing is an outage or a bad symbol in each half;
+        # one symbol from each tells them apart
+        alive = False
+        for i, part in enumerate(errored):
+            try:
+                g, r = _download(provider, part[:1], start, end, timeout)
+            except Exception:
+                continue
+            got.update(g)
+            reason.update(r)
+            errored[i], alive = part[1:], True
+        if not alive:
+            return got, {t: reason[t] for t in todo if t not in got}
+    for part in errored:
+        if len(part) > 1:
+            g, r = _split(provider, part, start, end, timeout)
+            got.update(g)
+            reason.update(r)
+    return got, {t: reason[t] for t in todo if t not in got}
+
+def _fetch_chunk(provider, chunk, start, end, timeout, retries, backoff):
+    got, todo, reason = {}, list(chunk), {}
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            g, reason = _download(provider, todo, start, end, timeout)
+        except Exception as e:
+            reason = {t: f"{type(e).__name__}: {e}" for t in todo}
+            if attempt == retries and len(todo) > 1:
+                g, reason = _split(provider, todo, start, end, timeout)
+                got.update(g)
+                break
+            continue
+        got.update(g)
+        todo = [t for t in todo if t not in got]
+        if not todo:
+            break
+    return got, {t: reason[t] for t in chunk if t not in got}
+
+def fetch_panel(provider, tickers, start, end, chunk=100, workers=4, timeout=10, retries=2, backoff=0.5):
+    """Fetch monthly closes for `tickers` as one date x ticker panel.
+
+    Tickers are requested in chunks of `chunk` symbols on up to `workers`
+    threads; each chunk is retried with exponential backoff, and symbols
+    still missing afterwards are reported in `failed` rather than raised.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    chunks = [tickers[i:i + chunk] for i in range(0, len(tickers), chunk)]
+    got, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as ex:
+        for g, f in ex.map(lambda c: _fetch_chunk(provider, c, start, end, timeout, retries, backoff), chunks):
+            got.update(g)
+            failed.update(f)
+    closes = pd.DataFrame(got).sort_index()
+    closes.index.name = "Date"
+    return Panel(closes.reindex(columns=[t for t in tickers if t in got]), failed)
@@ -0,0 +1,76 @@
+import threading
+from datetime import datetime, timedelta
+from peewee import Model, CharField, DateTimeField, chunked
+from store import db
+from metrics import inc
+
+class TickerMeta(Model):
+    ticker = CharField(primary_key=True)
+    sector = CharField()
+    name = CharField(null=True)
+    status = CharField()
+    verified_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = "ticker_meta"
+
+class MetadataIndex:
+    """Ticker -> sector/name kept locally and refreshed lazily.
+
+    Entries are loaded at startup and only refetched, in bulk, once older
+    than `ttl_days`. Tickers Yahoo reports without a sector are kept with
+    status "na" for `na_ttl_days` so they are not looked up on every call;
+    tickers the provider fails to answer for are not stored and retry.
+    """
+
+    def __init__(self, provider, ttl_days=90, na_ttl_days=7):
+        self.provider = provider
+        self.ttl = {"ok": timedelta(days=ttl_days), "na": timedelta(days=na_ttl_days)}
+        self._lock = threading.Lock()
+        db.create_tables([TickerMeta], safe=True)
+        self.entries = {r.ticker: r for r in TickerMeta.select()}
+
+    def _stale(self, t, now):
+        e = self.entries.get(t)
+        return e is None or now - e.verified_at > self.ttl[e.status]
+
+    def sectors(self, tickers):
+        now = datetime.now()
+        stale = [t for t in tickers if self._stale(t, now)]
+        inc("dam_cache_total", len(tickers) - len(stale), cache="metadata", result="hit")
+        inc("dam_cache_total", len(stale), cache="metadata", result="miss")
+        if stale:
+            self.refresh(stale)
+        return {t: self.entries[t].sector for t in tickers if t in self.entries}
+
+    def refresh(self, tickers):
+        now = datetime.now()
+        with self._lock:
+            # another worker may already have refreshed them
+            for part in chunked(tickers, 500):
+                self.entries.update({r.ticker: r for r in TickerMeta.select().where(TickerMeta.ticker.in_(part))})
+            tickers = [t for t in tickers if self._stale(t, now)]
+            if not tickers:
+                return
+            try:
+                inc("dam_provider_calls_total", method="profiles")
+                profiles = self.provider.profiles(tickers)
+            except Exception:
+                inc("dam_provider_errors_total", method="profiles")
+                return
+            # symbols the provider did not answer for are left stale so they
+            # retry; only a real "no sector" answer is negative-cached
+            inc("dam_provider_unanswered_total", sum(t not in profiles for t in tickers), method="profiles")
+            rows = []
+            for t in tickers:
+                if t not in profiles:
+                    continue
+                p = profiles[t]
+                sector = p.get("sector") or "N/A"
+                rows.append({"ticker": t, "sector": sector, "name": p.get("name"),
+                             "status": "na" if sector == "N/A" else "ok", "verified_at": now})
+            with db.atomic():
+                for part in chunked(rows, 200):
+                    TickerMeta.insert_many(part).on_conflict_replace().execute()
+            self.entries.update({r["ticker"]: TickerMeta(**r) for r in rows})
@@ -0,0 +1,123 @@
+import bisect, logging, threading, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HELP = {
+    "dam_stage_seconds": ("histogram", "Time spent per request stage."),
+    "dam_request_seconds": ("histogram", "HTTP request latency by route."),
+    "dam_provider_calls_total": ("counter", "Market data provider calls."),
+    "dam_provider_errors_total": ("counter", "Market data provider calls that raised."),
+    "dam_provider_unanswered_total": ("counter", "Symbols a provider call returned no answer for."),
+    "dam_dropped_tickers_total": ("counter", "Tickers left out of a ranking, by reason."),
+    "dam_cache_total": ("counter", "Cache lookups by cache and result."),
+}
+
+# spans recorded during the current request, for slow-request logging
+request_spans = ContextVar("request_spans", default=None)
+
+class Registry:
+    """Process-local counters and histograms rendered as Prometheus text."""
+
+    def __init__(self):
+        self.counters = {}
+        self.hists = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        if not value:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            h = self.hists.get(key)
+            if h is None:
+                h = self.hists[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+            h[0][i] += 1
+            h[1] += seconds
+
+    @contextmanager
+    def span(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            self.observe("dam_stage_seconds", dt, stage=stage)
+            spans = request_spans.get()
+            if spans is not None:
+                spans.append((stage, dt))
+
+    def stage_totals(self):
+        """Seconds spent so far per stage."""
+        with self._lock:
+            return {dict(k[1])["stage"]: h[1] for k, h in self.hists.items() if k[0] == "dam_stage_seconds"}
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self.counters.items())
+            hists = sorted((k, (list(h[0]), h[1])) for k, h in self.hists.items())
+        lines, typed = [], set()
+
+        def header(name):
+            if name not in typed:
+                typed.add(name)
+                kind, text = HELP.get(name, ("untyped", name))
+                lines.extend([f"# HELP {name} {text}", f"# TYPE {name} {kind}"])
+
+        def fmt(labels, **extra):
+            items = list(labels) + list(extra.items())
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{fmt(labels)} {value}")
+        for (name, labels), (counts, total) in hists:
+            header(name)
+            cum = 0
+            for le, c in zip([*map(str, BUCKETS), "+Inf"], counts):
+                cum += c
+                lines.append(f"{name}_bucket{fmt(labels, le=le)} {cum}")
+            lines.append(f"{name}_sum{fmt(labels)} {total}")
+            lines.append(f"{name}_count{fmt(labels)} {cum}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+inc, observe, span = registry.inc, registry.observe, registry.span
+
+class TimingMiddleware:
+    """Times every HTTP request by route and logs ones slower than `slow_ms`."""
+
+    def __init__(self, app, slow_ms=0, logger=logging.getLogger("dam")):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.logger = logger
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        spans, status = [], [500]
+        token = request_spans.set(spans)
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            dt = time.perf_counter() - t0
+            request_spans.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            observe("dam_request_seconds", dt, route=route)
+            if self.slow_ms and dt * 1000 >= self.slow_ms:
+                self.logger.warning("slow request %s %s -> %s in %.0f ms [%s]", scope["method"], route, status[0],
+                                    dt * 1000, ", ".join(f"{name} {sec * 1000:.0f} ms" for name, sec in spans))
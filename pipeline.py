@@ -0,0 +1,71 @@
+import heapq
+import numpy as np
+from scoring import score
+from metrics import inc, span
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+class TopK:
+    """Running best-k tickers per sector by DAM."""
+
+    def __init__(self, k=2):
+        self.k = k
+        self.heaps = {}
+        self.seen = 0
+
+    def add(self, tickers, sectors, dam):
+        for t, sec, d in zip(tickers, sectors, dam):
+            if np.isnan(d):
+                continue
+            # earlier tickers win ties, as with a stable sort
+            item = (d, -self.seen, t)
+            self.seen += 1
+            heap = self.heaps.setdefault(sec, [])
+            if len(heap) < self.k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    def rows(self):
+        out = []
+        for sec, heap in sorted(self.heaps.items()):
+            picks = [t for _, _, t in sorted(heap, reverse=True)]
+            out.append({"sector": sec, "ticker": picks[0], "alt_ticker": picks[1] if len(picks) > 1 else None})
+        return out
+
+def rank(store, metadata, tickers, sd, ed, chunk=250, k=2):
+    """Fetch, align and score `tickers` in chunks, keeping only the running top-k.
+
+    Yields a progress dict after every chunk; the last one carries the
+    sector rows. Memory is bounded by the chunk size, not the universe.
+    """
+    with span("spy_download"):
+        spy = store.get_panel(["SPY"], sd, ed).closes
+    if "SPY" not in spy.columns:
+        yield {"error": "SPY data missing or incomplete", "done": 0, "total": len(tickers)}
+        return
+    spy = spy["SPY"].dropna()
+    top, done, eligible, failed = TopK(k), 0, 0, 0
+    for part in chunks(tickers, chunk):
+        with span("ticker_download"):
+            panel = store.get_panel(part, sd, ed)
+        closes = panel.closes
+        with span("sector_lookup"):
+            sectors = metadata.sectors(list(closes.columns))
+        names = [t for t in closes.columns if sectors.get(t, "N/A") != "N/A"]
+        with span("scoring"):
+            idx = spy.index.union(closes.index)
+            scores = score(closes[names].reindex(idx).to_numpy().T, spy.reindex(idx).to_numpy())
+            top.add(names, [sectors[t] for t in names], scores.dam)
+        ok = int((~np.isnan(scores.r12)).sum())
+        inc("dam_dropped_tickers_total", len(part) - len(closes.columns), reason="no_data")
+        inc("dam_dropped_tickers_total", len(closes.columns) - len(names), reason="no_sector")
+        inc("dam_dropped_tickers_total", len(names) - ok, reason="short_history")
+        done += len(part)
+        eligible += ok
+        failed += len(panel.failed)
+        yield {"done": done, "total": len(tickers), "eligible": eligible, "failed": failed}
+    yield {"done": done, "total": len(tickers), "eligible": eligible, "failed": failed,
+           "month": spy.index.max().strftime("%Y-%m"), "tickers": top.rows()}
@@ -0,0 +1,59 @@
+from collections import namedtuple
+import numpy as np
+
+RF = 0.024 / 12
+WEIGHTS = np.array([0.01, 0.01, 0.04, 0.04, 0.09, 0.09, 0.16, 0.16, 0.25, 0.25, 0.36, 0.36])
+
+Scores = namedtuple("Scores", ["r12", "wr12", "v6", "b6", "dam"])
+
+def _pack(mask, *arrays):
+    # left-justify the masked entries of every row, NaN-padding the rest, so
+    # column i holds each ticker's i-th usable month
+    order = np.argsort(~mask, axis=1, kind="stable")
+    keep = np.arange(mask.shape[1]) < mask.sum(axis=1)[:, None]
+    return [np.where(keep, np.take_along_axis(a, order, axis=1), np.nan) for a in arrays]
+
+def _excess(c):
+    r = np.full(c.shape, np.nan)
+    r[..., 1:] = c[..., 1:] / c[..., :-1] - 1 - RF
+    return r
+
+def spy_returns(spy):
+    """SPY excess returns over its own bars, first bar 0 as in the original model."""
+    spy = np.asarray(spy, dtype=float)
+    ok = ~np.isnan(spy)
+    out = np.full(spy.shape, np.nan)
+    r = _excess(spy[ok])
+    if r.size:
+        r[0] = 0
+    out[ok] = r
+    return out
+
+def score(closes, spy):
+    """DAM inputs and score for every row of a tickers x months close matrix.
+
+    `closes` and `spy` are aligned on the same months (oldest first) with NaN
+    for missing bars. Each ticker uses its first 13 months that have both a
+    return and a SPY return; tickers with fewer get NaN.
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=float))
+    n, m = closes.shape
+    if m < 14:
+        closes = np.hstack([closes, np.full((n, 14 - m), np.nan)])
+        spy = np.concatenate([np.asarray(spy, dtype=float), np.full(14 - m, np.nan)])
+    s = np.broadcast_to(spy_returns(spy), closes.shape)
+    c, s = _pack(~np.isnan(closes), closes, s)
+    r = _excess(c)
+    c, r, s = _pack(~np.isnan(r) & ~np.isnan(s), c, r, s)
+    ok = ~np.isnan(c[:, 12])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r12 = (c[:, 12] - c[:, 0]) / c[:, 0]
+        wr12 = r[:, :12] @ WEIGHTS
+        x, y = r[:, :6], s[:, :6]
+        v6 = x.std(axis=1, ddof=1) * np.sqrt(2)
+        cov = ((x - x.mean(axis=1, keepdims=True)) * (y - y.mean(axis=1, keepdims=True))).sum(axis=1) / 5
+        b6 = cov / y.var(axis=1)
+        dam = (r12 * wr12) / (v6 * b6)
+    dam[~ok | (v6 == 0) | (b6 == 0)] = np.nan
+    return Scores(r12, wr12, v6, b6, dam)
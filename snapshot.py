@@ -0,0 +1,62 @@
+import json
+from datetime import datetime
+from peewee import Model, CharField, TextField, DateTimeField, CompositeKey
+from store import db
+
+class Snapshot(Model):
+    universe = CharField()
+    month = CharField()
+    payload = TextField()
+    created_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = "ranking_snapshot"
+        primary_key = CompositeKey("universe", "month")
+
+class Snapshots:
+    """Sector picks and weights computed once per universe and data month.
+
+    `build(universe)` returns a payload dict with "universe" and the data
+    month it was computed for under "month". Payloads are persisted so other
+    workers and restarts pick them up; the in-memory one keeps being served
+    while a rebuild for a newer month runs. Callers coalesce builds per
+    universe, so none are started here.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self.current = {}
+        db.create_tables([Snapshot], safe=True)
+        for row in Snapshot.select().order_by(Snapshot.month):
+            self.current[row.universe] = json.loads(row.payload)
+
+    def get(self, universe):
+        snap = self.current.get(universe)
+        return snap if snap is not None else self.rebuild(universe)
+
+    def stale(self, universe, month):
+        current = self.current.get(universe)
+        return current is None or current["month"] < month
+
+    def refresh(self, universe, month):
+        """Load `month` if another worker already saved it, otherwise rebuild."""
+        row = Snapshot.get_or_none(Snapshot.universe == universe, Snapshot.month == month)
+        if row is None:
+            return self.rebuild(universe)
+        snap = json.loads(row.payload)
+        self.current[universe] = snap
+        return snap
+
+    def rebuild(self, universe):
+        return self.save(self.build(universe))
+
+    def save(self, snap):
+        if snap.get("error"):
+            return snap
+        Snapshot.insert(universe=snap["universe"], month=snap["month"], payload=json.dumps(snap),
+                        created_at=datetime.now()).on_conflict_replace().execute()
+        current = self.current.get(snap["universe"])
+        if current is None or current["month"] <= snap["month"]:
+            self.current[snap["universe"]] = snap
+        return snap
@@ -0,0 +1,217 @@
+import sys, threading
+from functools import lru_cache
+from datetime import datetime, timedelta
+import pandas as pd, numpy as np
+from peewee import SqliteDatabase, Model, CharField, FloatField, DateTimeField, CompositeKey, chunked
+from market import Panel, fetch_panel
+from metrics import inc
+
+db = SqliteDatabase(None, pragmas={"journal_mode": "wal", "busy_timeout": 30000, "synchronous": "normal"})
+
+class MonthlyClose(Model):
+    ticker = CharField()
+    month = CharField()
+    close = FloatField()
+    fetched_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = "monthly_close"
+        primary_key = CompositeKey("ticker", "month")
+
+class Coverage(Model):
+    # earliest month ever requested for a ticker, so months before its first
+    # bar (pre-IPO) are not treated as missing on every call
+    ticker = CharField(primary_key=True)
+    since = CharField()
+
+    class Meta:
+        database = db
+        table_name = "coverage"
+
+class NoData(Model):
+    # tickers the provider recently answered with no new bars for (unknown or
+    # delisted symbols), from month `since` on, so they are not refetched on
+    # every call
+    ticker = CharField(primary_key=True)
+    since = CharField()
+    checked_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = "no_data"
+
+def _month(ts):
+    return ts.strftime("%Y-%m")
+
+@lru_cache(maxsize=4096)
+def _shift(month, n):
+    i = int(month[:4]) * 12 + int(month[5:7]) - 1 + n
+    return f"{i // 12:04d}-{i % 12 + 1:02d}"
+
+@lru_cache(maxsize=4096)
+def _closes_at(month):
+    return datetime.strptime(_shift(month, 1), "%Y-%m")
+
+def _is_final(month, fetched_at, lag):
+    # a bar is final once it was fetched after its month closed (plus a lag
+    # for the provider to settle the last session)
+    return fetched_at >= _closes_at(month) + lag
+
+class PriceStore:
+    """Monthly adjusted closes persisted in SQLite in front of a provider.
+
+    Only months that are missing or still open are fetched; everything else
+    is served locally. WAL mode and a busy timeout let several uvicorn
+    workers share one database file.
+    """
+
+    def __init__(self, path, provider, open_ttl=900, no_data_ttl=86400, final_lag_days=1, tolerance=1e-4):
+        self.provider = provider
+        self.open_ttl = timedelta(seconds=open_ttl)
+        self.no_data_ttl = timedelta(seconds=no_data_ttl)
+        self.lag = timedelta(days=final_lag_days)
+        self.tolerance = tolerance
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        db.init(path)
+        db.create_tables([MonthlyClose, Coverage, NoData], safe=True)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def invalidate(self, *tickers):
+        """Forget stored bars, e.g. after a split or dividend re-adjustment."""
+        with db.atomic():
+            for part in chunked(tickers, 500):
+                MonthlyClose.delete().where(MonthlyClose.ticker.in_(part)).execute()
+                Coverage.delete().where(Coverage.ticker.in_(part)).execute()
+                NoData.delete().where(NoData.ticker.in_(part)).execute()
+
+    def _load(self, tickers, first, last):
+        rows, since, no_data = {t: {} for t in tickers}, {}, {}
+        for part in chunked(tickers, 500):
+            q = MonthlyClose.select().where(MonthlyClose.ticker.in_(part),
+                                            MonthlyClose.month.between(first, last))
+            # raw cursor: peewee's per-row datetime conversion dominates long histories
+            for t, m, c, at in db.execute(q):
+                rows[t][m] = (c, datetime.fromisoformat(at) if isinstance(at, str) else at)
+            since.update(Coverage.select(Coverage.ticker, Coverage.since).where(Coverage.ticker.in_(part)).tuples())
+            no_data.update((t, (m, at)) for t, m, at in NoData.select().where(NoData.ticker.in_(part)).tuples())
+        return rows, since, no_data
+
+    def _plan(self, t, have, since, no_data, first, months, now):
+        # month to fetch from, or None when everything is served locally
+        if t in no_data and no_data[t][0] <= first and now - no_data[t][1] < self.no_data_ttl:
+            return None
+        if t not in since or since[t] > first:
+            return first
+        final = [m for m in months if m in have and _is_final(m, have[m][1], self.lag)]
+        start = _shift(final[-1], 1) if final else first
+        if start > months[-1]:
+            return None
+        if all(m in have and now - have[m][1] < self.open_ttl for m in months if m >= start):
+            return None
+        return start
+
+    def get_panel(self, tickers, start, end):
+        tickers = list(dict.fromkeys(tickers))
+        now = datetime.now()
+        # `end` is exclusive like the provider's: a month is expected once its first day is before it
+        months = [_month(d) for d in pd.date_range(pd.Timestamp(start).replace(day=1), end, freq="MS", inclusive="left")]
+        first = months[0]
+        rows, since, no_data = self._load(tickers, first, months[-1])
+
+        groups, plan, failed = {}, {}, {}
+        for t in tickers:
+            fetch_from = self._plan(t, rows[t], since, no_data, first, months, now)
+            if fetch_from is None and t in no_data and not rows[t]:
+                failed[t] = "no data"
+            elif fetch_from is not None:
+                plan[t] = fetch_from
+                # reach one final month back to catch provider re-adjustments
+                groups.setdefault(fetch_from if fetch_from == first else _shift(fetch_from, -1), []).append(t)
+
+        refetch = []
+        for fetch_from, group in groups.items():
+            panel = fetch_panel(self.provider, group, fetch_from + "-01", end)
+            failed.update(panel.failed)
+            saved, covered = {}, {}
+            # answered, but with no bars for the last two months (unknown or
+            # delisted); provider errors are left out so they retry
+            recent = {t: max(plan[t], _shift(months[-1], -1)) + "-01" for t in group}
+            empty = [t for t in group if panel.failed.get(t) == "no data" or
+                     t in panel.closes.columns and not (panel.closes[t].dropna().index >= recent[t]).any()]
+            for t in panel.closes.columns:
+                got = {_month(d): c for d, c in panel.closes[t].dropna().items()}
+                if fetch_from != first and self._readjusted(rows[t], got, fetch_from):
+                    refetch.append(t)
+                    continue
+                saved[t] = got
+                if fetch_from == first:
+                    covered[t] = min(since.get(t, first), first)
+                rows[t].update({m: (c, now) for m, c in got.items()})
+            self._save(saved, covered, now, {t: min(since.get(t, first), first) for t in empty if t not in refetch})
+        if refetch:
+            self.invalidate(*refetch)
+            panel = fetch_panel(self.provider, refetch, first + "-01", end)
+            failed.update(panel.failed)
+            saved = {t: {_month(d): c for d, c in panel.closes[t].dropna().items()} for t in panel.closes.columns}
+            self._save(saved, {t: first for t in saved}, now, {})
+            for t, got in saved.items():
+                rows[t] = {m: (c, now) for m, c in got.items()}
+                plan[t] = first
+
+        hits = misses = 0
+        for t in tickers:
+            for m in months:
+                if m not in rows[t]:
+                    continue
+                if t in plan and m >= plan[t]:
+                    misses += 1
+                else:
+                    hits += 1
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        inc("dam_cache_total", hits, cache="prices", result="hit")
+        inc("dam_cache_total", misses, cache="prices", result="miss")
+
+        at = {m: i for i, m in enumerate(months)}
+        present = [t for t in tickers if any(m in at for m in rows[t])]
+        data = np.full((len(months), len(present)), np.nan)
+        for j, t in enumerate(present):
+            for m, (c, _) in rows[t].items():
+                if m in at:
+                    data[at[m], j] = c
+        index = pd.DatetimeIndex([m + "-01" for m in months], name="Date")
+        closes = pd.DataFrame(data, index=index, columns=present).dropna(how="all")
+        return Panel(closes, {t: r for t, r in failed.items() if t not in closes.columns})
+
+    def _readjusted(self, have, got, overlap):
+        if overlap not in have or overlap not in got:
+            return False
+        old = have[overlap][0]
+        return abs(got[overlap] - old) > self.tolerance * abs(old)
+
+    def _save(self, saved, covered, now, no_data):
+        data = [{"ticker": t, "month": m, "close": float(c), "fetched_at": now}
+                for t, got in saved.items() for m, c in got.items()]
+        with db.atomic():
+            for part in chunked(data, 200):
+                MonthlyClose.insert_many(part).on_conflict_replace().execute()
+            for part in chunked([{"ticker": t, "since": m} for t, m in covered.items()], 200):
+                Coverage.insert_many(part).on_conflict_replace().execute()
+            for part in chunked([t for t in saved if t not in no_data], 500):
+                NoData.delete().where(NoData.ticker.in_(part)).execute()
+            for part in chunked([{"ticker": t, "since": m, "checked_at": now} for t, m in no_data.items()], 200):
+                NoData.insert_many(part).on_conflict_replace().execute()
+
+if __name__ == "__main__":
+    # python store.py invalidate AAPL MSFT
+    from market import make_provider
+    import os
+    if len(sys.argv) > 2 and sys.argv[1] == "invalidate":
+        PriceStore(os.environ.get("DAM_DB", "dam.db"), make_provider(os.environ.get("DAM_PROVIDER", "yahoo"))).invalidate(*sys.argv[2:])
+    else:
+        print("usage: python store.py invalidate TICKER [TICKER ...]")
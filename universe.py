@@ -0,0 +1,21 @@
+import csv, os, re
+
+UNIVERSE_DIR = os.environ.get("DAM_UNIVERSE_DIR", "universes")
+
+def list_universes():
+    return sorted(f[:-4] for f in os.listdir(UNIVERSE_DIR) if f.endswith(".csv"))
+
+def load_universe(name):
+    """Tickers from universes/<name>.csv: a `ticker` or `symbol` column, or the first column."""
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", name or ""):
+        raise KeyError(name)
+    path = os.path.join(UNIVERSE_DIR, name + ".csv")
+    if not os.path.exists(path):
+        raise KeyError(name)
+    with open(path, newline="") as f:
+        rows = [r for r in csv.reader(f) if r and r[0].strip()]
+    header = [c.strip().lower() for c in rows[0]] if rows else []
+    col = next((header.index(h) for h in ("ticker", "symbol") if h in header), 0)
+    if header and header[col] in ("ticker", "symbol"):
+        rows = rows[1:]
+    return list(dict.fromkeys(r[col].strip().upper() for r in rows))